@@ -1,129 +1,440 @@
 import os
+import asyncio
 from dotenv import load_dotenv
 import logging
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
+from telegram.error import TelegramError
+from telegram.ext import AIORateLimiter, Application, CommandHandler, MessageHandler, ContextTypes, filters
 import openai
+import httpx
+import requests
 from youtube_transcript_api import YouTubeTranscriptApi
-from notion_client import Client
-import json
+from notion_client import AsyncClient, APIResponseError
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+import re
+import textwrap
+import orjson
+import hashlib
 import sys
-from urllib.parse import urlparse, parse_qs
+import secrets
+import time
+import sqlite3
+import threading
+import functools
+import operator
+from array import array
+from collections import Counter, OrderedDict
+from contextlib import closing
+from dataclasses import dataclass
+
+# Read .env before any module-level setting below is evaluated
+load_dotenv()
 
 # Enable logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper()
 )
 logger = logging.getLogger(__name__)
 
+# On-disk cache for expensive upstream results (transcripts, recipes)
+CACHE_DB_PATH = os.environ.get('COOKBOT_CACHE_DB', 'cookbot_cache.db')
+TRANSCRIPT_CACHE_TTL = 7 * 24 * 60 * 60  # 7 days
+RECIPE_CACHE_TTL = 30 * 24 * 60 * 60  # 30 days
+NOTION_VERIFY_TTL = 24 * 60 * 60  # 1 day
+# Expired rows are purged from each table at startup so the database does not grow forever
+CACHE_TABLE_TTLS = {
+    'transcripts': TRANSCRIPT_CACHE_TTL,
+    'transcript_summaries': RECIPE_CACHE_TTL,
+    'recipes': RECIPE_CACHE_TTL,
+    'recipe_embeddings': RECIPE_CACHE_TTL,
+    'notion_verification': NOTION_VERIFY_TTL,
+}
+# Near-duplicate transcripts (re-uploads, mirror channels) reuse a cached recipe above this cosine similarity
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 500
+cache_stats = Counter()
+
+OPENAI_MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Keeps embedding input well below the embedding model's 8191-token limit
+EMBEDDING_MAX_CHARS = 20000
+# Upper bound on transcript length sent to the model (~8000 tokens at ~4 chars per token)
+MAX_TRANSCRIPT_CHARS = 32000
+# Longer transcripts are condensed chunk by chunk before the recipe call
+LONG_TRANSCRIPT_CHARS = 16000
+SUMMARY_CHUNK_CHARS = 4000
+MAX_CONCURRENT_SUMMARIES = 8
+# Caption annotations and channel boilerplate that carry no recipe information
+FILLER_RE = re.compile(
+    r"(?:\[[^\]]*\]"
+    r"|\b(?:hey|hi|hello) (?:guys|everyone|everybody)\b"
+    r"|\bwelcome back(?: to (?:my|the) channel)?\b"
+    r"|\b(?:(?:(?:and )?(?:don't forget to|make sure to)|please) (?:like and )?|like and )"
+    r"subscribe(?: to (?:my|the|our) channel)?\b"
+    r"|\bsubscribe to (?:my|the|our) channel\b"
+    r"|\b(?:and )?hit the (?:notification )?bell(?: icon)?\b)[,.!]*",
+    re.IGNORECASE
+)
+# Cheap anchored gate for YouTube links, with or without a scheme and on any subdomain (www., m., ...)
+YT_URL_RE = re.compile(r'^(?:https?://)?(?:[\w-]+\.)*(?:youtube\.com|youtu\.be)/', re.IGNORECASE)
+# Matches watch, youtu.be, shorts, live and embed links and captures the 11-character video ID;
+# the host is case-insensitive like YT_URL_RE, the case-sensitive ID is captured as written,
+# and an overlong ID does not match at all rather than being truncated to a different video
+YT_RE = re.compile(
+    r'(?:(?i:youtu\.be)/|(?i:youtube\.com)/(?:shorts/|live/|embed/|v/|watch\?(?:[^ ]*&)?v=))([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])')
+# Ingredient annotations that replace the quantity column or are re-appended to the name
+INGREDIENT_SUFFIX_RE = re.compile(r'\s*(\(optional\)|\(for garnish\)|\bto taste\b)\s*')
+# Leading amount (e.g. "200", "1.5", "1/2", "2-3"), optionally followed by a unit ("tsp", "tsp."),
+# then the ingredient name; a unit only counts after an amount, so "Pieces of chicken" stays a name
+INGREDIENT_RE = re.compile(
+    r'(?:(?P<qty>\d(?:[\d.,/]*\d)?(?:-\d(?:[\d.,/]*\d)?)?)\s*'
+    r'(?:(?P<unit>g|ml|tbsp|tsp|tablespoons?|teaspoons?|cups?|pieces?)\.?)?(?=\s|$)\s*)?'
+    r'(?P<name>.*)',
+    re.IGNORECASE
+)
+# Telegram rate-limits message edits to roughly one per second per chat
+PROGRESS_EDIT_INTERVAL = 1.0
+# Number of background workers processing recipes concurrently
+PIPELINE_WORKERS = int(os.environ.get('PIPELINE_WORKERS', 4))
+# Links one user may have queued or in progress at the same time
+MAX_PENDING_PER_USER = 10
+# Transcripts fetched in parallel when a message contains several links
+MAX_TRANSCRIPT_FETCHES = 10
+# Notion accepts at most 100 child blocks per request
+NOTION_MAX_BLOCKS_PER_REQUEST = 100
+
+# Thumbnail sizes to probe, best first; resolved URLs are remembered per video ID, least recently used evicted first
+THUMBNAIL_QUALITIES = ("maxresdefault", "hqdefault", "mqdefault")
+THUMBNAIL_CACHE_SIZE = 1024
+thumbnail_cache = OrderedDict()
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Required settings, parsed once from the environment."""
+    telegram_token: str
+    openai_token: str
+    authorized_user_id: int
+    notion_token: str
+    notion_database_id: str
+
+
+REQUIRED_VARS = ('TELEGRAM_TOKEN', 'OPENAI_TOKEN', 'TELEGRAM_ID', 'NOTION_TOKEN', 'NOTION_DATABASE_ID')
+
 
 def validate_environment():
     """Validate all required environment variables are set and valid."""
-    load_dotenv()
-
-    required_vars = {
-        'TELEGRAM_TOKEN': os.environ.get('TELEGRAM_TOKEN'),
-        'OPENAI_TOKEN': os.environ.get('OPENAI_TOKEN'),
-        'TELEGRAM_ID': os.environ.get('TELEGRAM_ID'),
-        'NOTION_TOKEN': os.environ.get('NOTION_TOKEN'),
-        'NOTION_DATABASE_ID': os.environ.get('NOTION_DATABASE_ID')
-    }
-
-    missing_vars = [var for var, value in required_vars.items() if not value]
+    missing_vars = [var for var in REQUIRED_VARS if not os.environ.get(var)]
 
     if missing_vars:
         logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
         logger.error("Please check your .env file contains all required variables")
         sys.exit(1)
 
+    try:
+        authorized_user_id = int(os.environ['TELEGRAM_ID'])
+    except ValueError:
+        logger.error("TELEGRAM_ID must be a numeric Telegram user ID")
+        sys.exit(1)
+
+    config = Config(
+        telegram_token=os.environ['TELEGRAM_TOKEN'],
+        openai_token=os.environ['OPENAI_TOKEN'],
+        authorized_user_id=authorized_user_id,
+        notion_token=os.environ['NOTION_TOKEN'],
+        notion_database_id=os.environ['NOTION_DATABASE_ID']
+    )
+
     logger.info("Environment variables validated successfully")
-    logger.info(f"Using Notion Database ID: {required_vars['NOTION_DATABASE_ID']}")
+    logger.info(f"Using Notion Database ID: {config.notion_database_id}")
+
+    return config
+
+
+@functools.lru_cache(maxsize=1)
+def get_config():
+    """Validate the environment on first use and keep the result."""
+    return validate_environment()
+
+
+# Optional webhook mode; the bot falls back to long polling when WEBHOOK_URL is not set
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')
+WEBHOOK_PORT = int(os.environ.get('WEBHOOK_PORT', 8443))
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET') or secrets.token_urlsafe(24)
+
+# Long-lived HTTP clients so every request reuses pooled keep-alive connections.
+# They are created on first use, so importing this module needs no credentials or network.
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+
 
+@functools.lru_cache(maxsize=1)
+def get_http():
+    """Return the shared HTTP client used by OpenAI and thumbnail probes."""
+    # Both send absolute URLs and per-request headers, so they can safely share one pool
+    return openai.DefaultAsyncHttpxClient(limits=HTTP_LIMITS)
 
-    return required_vars
 
+@functools.lru_cache(maxsize=1)
+def get_openai():
+    """Return the shared OpenAI client."""
+    return openai.AsyncOpenAI(
+        api_key=get_config().openai_token,
+        http_client=get_http()
+    )
 
-# Validate environment variables
-env_vars = validate_environment()
 
-# Initialize clients with validated environment variables
-TELEGRAM_TOKEN = env_vars['TELEGRAM_TOKEN']
-OPENAI_TOKEN = env_vars['OPENAI_TOKEN']
-AUTHORIZED_USER_ID = int(env_vars['TELEGRAM_ID'])
-NOTION_TOKEN = env_vars['NOTION_TOKEN']
-NOTION_DATABASE_ID = env_vars['NOTION_DATABASE_ID']
+@functools.lru_cache(maxsize=1)
+def get_notion():
+    """Return the shared Notion client."""
+    # HTTP/2 multiplexes page creation and block appends over a single Notion connection.
+    # notion_client sets its base URL and auth header on the client it is given, so it keeps its own.
+    return AsyncClient(
+        auth=get_config().notion_token,
+        client=httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=10, keepalive_expiry=300)
+        )
+    )
+
+
+# YouTubeTranscriptApi and requests.Session are not thread-safe, so every transcript thread gets its own
+# pair; the executor reuses its threads, so each one keeps its keep-alive connections between fetches
+youtube_local = threading.local()
+youtube_sessions = []
+
+
+def get_ytt_api():
+    """Return this thread's YouTube Transcript API client, creating it on first use."""
+    api = getattr(youtube_local, 'api', None)
+    if api is None:
+        session = requests.Session()
+        youtube_sessions.append(session)
+        api = youtube_local.api = YouTubeTranscriptApi(http_client=session)
+    return api
+
 
-openai.api_key = OPENAI_TOKEN
-notion = Client(auth=NOTION_TOKEN)
+def notion_verification_key():
+    """Build the cache key for a successful Notion check of the current database and token."""
+    config = get_config()
+    credentials = f"{config.notion_database_id}:{config.notion_token}"
+    return hashlib.blake2b(credentials.encode(), digest_size=16).hexdigest()
 
 
-def verify_notion_access():
-    """Verify access to Notion database."""
+async def verify_notion_access():
+    """Verify access to Notion database, reusing a recent successful check."""
+    if cache_get('notion_verification', notion_verification_key(), NOTION_VERIFY_TTL):
+        logger.info("Notion access assumed OK (cached verification)")
+        return True
+
     try:
         # Try to query the database to verify access
-        notion.databases.retrieve(NOTION_DATABASE_ID)
+        await get_notion().databases.retrieve(get_config().notion_database_id)
         logger.info("Notion database access verified successfully")
+        cache_set('notion_verification', notion_verification_key(), '1')
         return True
     except Exception as e:
         logger.error(f"Failed to access Notion database: {e}")
         return False
 
 
-# Verify Notion access on startup
-if not verify_notion_access():
-    logger.error("Could not access Notion database. Please check your NOTION_TOKEN and NOTION_DATABASE_ID")
-    sys.exit(1)
+async def post_init(application: Application):
+    """Purge the cache, verify Notion access and start the pipeline workers before any update is handled."""
+    await asyncio.to_thread(purge_expired_cache)
+
+    if os.environ.get('SKIP_NOTION_VERIFY') == '1':
+        logger.info("Skipping Notion access verification (SKIP_NOTION_VERIFY=1)")
+    elif not await verify_notion_access():
+        logger.error("Could not access Notion database. Please check your NOTION_TOKEN and NOTION_DATABASE_ID")
+        # PTB swallows SystemExit raised here, so stop cleanly and let main() report the failure
+        application.bot_data['startup_failed'] = True
+        application.stop_running()
+        return
+
+    pipeline_workers.extend(
+        asyncio.create_task(pipeline_worker(application.bot)) for _ in range(PIPELINE_WORKERS))
+    logger.info(f"Started {PIPELINE_WORKERS} pipeline workers")
+
+
+async def post_shutdown(application: Application):
+    """Stop the pipeline workers and close the shared HTTP clients."""
+    for worker in pipeline_workers:
+        worker.cancel()
+    await asyncio.gather(*pipeline_workers, return_exceptions=True)
+
+    # Only close the clients that were actually created
+    if get_openai.cache_info().currsize:
+        await get_openai().close()
+    if get_notion.cache_info().currsize:
+        await get_notion().aclose()
+    if get_http.cache_info().currsize:
+        await get_http().aclose()
+    for session in youtube_sessions:
+        session.close()
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    if user_id != AUTHORIZED_USER_ID:
+    if user_id != get_config().authorized_user_id:
         await update.message.reply_text("Sorry, you are not authorized to use this bot.")
         return
     await update.message.reply_text(
         'Hello! Send me a YouTube cooking video link, and I\'ll create a recipe and save it to Notion.')
 
 
+@functools.lru_cache(maxsize=1024)
+def _is_youtube_url(url):
+    """Check whether the message is a URL pointing at a YouTube domain."""
+    return YT_URL_RE.match(url) is not None
+
+
+@functools.lru_cache(maxsize=1024)
 def extract_video_id(url):
     """Extract YouTube video ID from a URL."""
+    return m.group(1) if (m := YT_RE.search(url)) else None
+
+
+def _open_cache(table):
+    """Open the cache database, creating the given table if needed."""
+    conn = sqlite3.connect(CACHE_DB_PATH)
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT, ts INTEGER)")
+    return conn
+
+
+def cache_get(table, key, max_age):
+    """Return a cached value if it exists and is younger than max_age seconds."""
     try:
-        parsed_url = urlparse(url)
-        if parsed_url.netloc in ["www.youtube.com", "youtube.com"]:
-            # Extract 'v' parameter for regular YouTube links
-            query_params = parse_qs(parsed_url.query)
-            if 'v' in query_params:
-                return query_params['v'][0]
-        elif parsed_url.netloc == "youtu.be":
-            # For shortened YouTube URLs
-            return parsed_url.path.lstrip('/')
-        elif 'youtube.com/shorts/' in url:
-            # For YouTube Shorts
-            return url.split('/shorts/')[1].split('?')[0]
-    except Exception as e:
-        logger.error(f"Error extracting video ID from URL {url}: {e}")
-    return None
+        with closing(_open_cache(table)) as conn:
+            row = conn.execute(f"SELECT value, ts FROM {table} WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"Error reading from {table} cache: {e}")
+        return None
+
+    if row is None or time.time() - row[1] > max_age:
+        cache_stats[f'{table}_misses'] += 1
+        return None
+
+    cache_stats[f'{table}_hits'] += 1
+    return row[0]
+
+
+def cache_set(table, key, value):
+    """Store a value in the cache, replacing any previous entry."""
+    try:
+        with closing(_open_cache(table)) as conn, conn:
+            conn.execute(f"INSERT OR REPLACE INTO {table} (key, value, ts) VALUES (?, ?, ?)",
+                         (key, value, int(time.time())))
+    except sqlite3.Error as e:
+        logger.error(f"Error writing to {table} cache: {e}")
+
+
+def cache_items(table, max_age, prefix=''):
+    """Return (key, value) pairs younger than max_age seconds whose key starts with prefix."""
+    try:
+        with closing(_open_cache(table)) as conn:
+            return conn.execute(f"SELECT key, value FROM {table} WHERE ts >= ? AND key LIKE ?",
+                                (int(time.time() - max_age), prefix + '%')).fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error reading from {table} cache: {e}")
+        return []
+
+
+def cache_touch(table, key):
+    """Mark an entry as recently used."""
+    try:
+        with closing(_open_cache(table)) as conn, conn:
+            conn.execute(f"UPDATE {table} SET ts = ? WHERE key = ?", (int(time.time()), key))
+    except sqlite3.Error as e:
+        logger.error(f"Error writing to {table} cache: {e}")
+
+
+def cache_delete(table, key):
+    """Remove an entry from the cache."""
+    try:
+        with closing(_open_cache(table)) as conn, conn:
+            conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+    except sqlite3.Error as e:
+        logger.error(f"Error deleting from {table} cache: {e}")
+
+
+def cache_purge(table, max_age):
+    """Delete entries older than max_age seconds."""
+    try:
+        with closing(_open_cache(table)) as conn, conn:
+            deleted = conn.execute(f"DELETE FROM {table} WHERE ts < ?", (int(time.time() - max_age),)).rowcount
+    except sqlite3.Error as e:
+        logger.error(f"Error purging {table} cache: {e}")
+        return
+
+    if deleted:
+        logger.info(f"Purged {deleted} expired entries from {table} cache")
 
 
+def purge_expired_cache():
+    """Delete expired entries from every cache table."""
+    for table, max_age in CACHE_TABLE_TTLS.items():
+        cache_purge(table, max_age)
+
+
+def cache_trim(table, max_entries):
+    """Evict the least recently stored entries beyond max_entries."""
+    try:
+        with closing(_open_cache(table)) as conn, conn:
+            conn.execute(f"DELETE FROM {table} WHERE key NOT IN "
+                         f"(SELECT key FROM {table} ORDER BY ts DESC LIMIT ?)", (max_entries,))
+    except sqlite3.Error as e:
+        logger.error(f"Error trimming {table} cache: {e}")
+
 
 def get_transcript(video_id):
-    """Get video transcript using YouTube Transcript API."""
+    """Get video transcript using YouTube Transcript API, served from the disk cache when possible."""
+    cached = cache_get('transcripts', video_id, TRANSCRIPT_CACHE_TTL)
+    if cached is not None:
+        logger.info(f"Transcript cache hit for {video_id} "
+                    f"(hits: {cache_stats['transcripts_hits']}, misses: {cache_stats['transcripts_misses']})")
+        return cached
+
+    logger.info(f"Transcript cache miss for {video_id} "
+                f"(hits: {cache_stats['transcripts_hits']}, misses: {cache_stats['transcripts_misses']})")
     try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        return ' '.join([entry['text'] for entry in transcript])
+        transcript = get_ytt_api().fetch(video_id)
+        text = ' '.join([snippet.text for snippet in transcript])
     except Exception as e:
         logger.error(f"Error getting transcript: {e}")
         return None
 
+    cache_set('transcripts', video_id, text)
+    return text
 
-def generate_recipe(transcript):
-    """Generate recipe using OpenAI API."""
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system",
-                 "content": """
+
+def compress_transcript(transcript):
+    """Shrink a transcript before it is sent to the model.
+
+    Strips caption annotations and channel boilerplate, collapses whitespace
+    and drops consecutive duplicate words (common in auto-generated captions).
+    """
+    words = FILLER_RE.sub(' ', transcript).split()
+    deduped = [word for i, word in enumerate(words) if i == 0 or word != words[i - 1]]
+    return ' '.join(deduped)
+
+
+async def get_transcripts_batch(video_ids, max_concurrency=MAX_TRANSCRIPT_FETCHES):
+    """Fetch several transcripts concurrently; failed fetches yield None."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(video_id):
+        async with semaphore:
+            return await asyncio.to_thread(get_transcript, video_id)
+
+    results = await asyncio.gather(*[fetch(video_id) for video_id in video_ids], return_exceptions=True)
+    return [None if isinstance(result, Exception) else result for result in results]
+
+
+# Kept byte-identical across requests so OpenAI's prompt caching can reuse the prefix.
+# Bump PROMPT_VERSION whenever a prompt changes so cached model output is invalidated.
+PROMPT_VERSION = "v3"
+SYSTEM_PROMPT = textwrap.dedent("""
         You are an expert chef who creates clear, structured recipes. Create a recipe based on the video transcript provided, including a single list of ingredients and step-by-step instructions. 
         If an ingredient appears multiple times in the recipe, combine the quantities (e.g., if 20g pepper is used for the meat and 50g for the sauce, the total should be 70g of pepper). All ingredients should be listed together, not categorized. Please provide all measurements in units of g, ml, tablespoon, teaspoon, or pieces. 
         The preparation steps should be understandable, with about 6-8 steps for each recipe. 
@@ -150,22 +461,170 @@ def generate_recipe(transcript):
         Add reasonable metadata values based on your culinary expertise and knowledge of similar recipes.
         
         If the video is not a cooking video, return: {"title": "NotARecipe"}
+""").strip()
 
-        Make sure to return ONLY the JSON object, no additional text or formatting.
-        """
-                 },
-                {"role": "user", "content": f"Please create a recipe based on this transcript: {transcript}"}
+
+SUMMARY_PROMPT = (
+    "You condense part of a cooking video transcript. Keep every sentence about ingredients, "
+    "quantities, temperatures, timings and preparation steps, in their original order. "
+    "Drop greetings, sponsor messages, anecdotes and other chit-chat. Reply with the condensed text only."
+)
+
+
+def llm_cache_key(text):
+    """Build the cache key for model output from the model, prompt version and input text."""
+    digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+    return f"{OPENAI_MODEL}:{PROMPT_VERSION}:{digest}"
+
+
+async def embed_transcript(transcript):
+    """Embed the transcript for the semantic recipe cache; returns None on failure."""
+    try:
+        response = await get_openai().embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=transcript[:EMBEDDING_MAX_CHARS]
+        )
+        return array('f', response.data[0].embedding)
+    except Exception as e:
+        logger.warning(f"Error embedding transcript: {e}")
+        return None
+
+
+def find_similar_recipe(embedding):
+    """Return the cache key of the most similar cached recipe above the threshold, if any."""
+    best_key, best_score = None, SEMANTIC_CACHE_THRESHOLD
+    # Only compare against recipes generated with the current model and prompt
+    for key, blob in cache_items('recipe_embeddings', RECIPE_CACHE_TTL, f"{OPENAI_MODEL}:{PROMPT_VERSION}:"):
+        # OpenAI embeddings are unit length, so the dot product is the cosine similarity
+        score = sum(map(operator.mul, embedding, array('f', blob)))
+        if score >= best_score:
+            best_key, best_score = key, score
+    return best_key
+
+
+async def summarize_chunk(chunk, semaphore):
+    """Condense one transcript chunk, served from the disk cache when possible."""
+    cache_key = llm_cache_key(chunk)
+    cached = cache_get('transcript_summaries', cache_key, RECIPE_CACHE_TTL)
+    if cached is not None:
+        return cached
+
+    async with semaphore:
+        response = await get_openai().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": chunk}
             ]
         )
+    summary = response.choices[0].message.content
+    cache_set('transcript_summaries', cache_key, summary)
+    return summary
+
+
+async def condense_transcript(transcript):
+    """Summarize long transcripts chunk by chunk and cap the length sent to the model."""
+    if len(transcript) > LONG_TRANSCRIPT_CHARS:
+        chunks = textwrap.wrap(transcript, SUMMARY_CHUNK_CHARS, break_long_words=False)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SUMMARIES)
+        try:
+            summaries = await asyncio.gather(*[summarize_chunk(chunk, semaphore) for chunk in chunks])
+            logger.info(f"Condensed transcript from {len(transcript)} to {sum(map(len, summaries))} characters "
+                        f"in {len(chunks)} chunks")
+            transcript = ' '.join(summaries)
+        except Exception as e:
+            # Fall back to the truncated transcript rather than failing the recipe
+            logger.warning(f"Error condensing transcript: {e}")
+    return transcript[:MAX_TRANSCRIPT_CHARS]
+
+
+async def warm_up_openai():
+    """Open a pooled connection to OpenAI ahead of the recipe request."""
+    try:
+        await get_openai().models.retrieve(OPENAI_MODEL)
+    except Exception as e:
+        logger.warning(f"OpenAI warm-up failed: {e}")
 
-        recipe_text = response.choices[0].message.content
-        logger.info(f"Generated recipe text: {recipe_text}")
 
-        # Try to parse the JSON to validate it
-        recipe_json = json.loads(recipe_text)
-        return recipe_text
+async def show_progress(message, recipe_text):
+    """Update the interim Telegram message while the recipe is being streamed."""
+    try:
+        await message.edit_text(f"Generating recipe... ({len(recipe_text)} characters received)")
+    except TelegramError as e:
+        logger.warning(f"Could not update progress message: {e}")
+
+
+async def generate_recipe(transcript, progress_message=None):
+    """Generate recipe using OpenAI API, served from the disk cache when possible.
+
+    The response is streamed; if progress_message is given it is edited periodically
+    so the user sees progress before the full recipe is available. Returns the recipe
+    as a dict, or None if it could not be generated.
+    """
+    transcript = compress_transcript(transcript)
+    cache_key = llm_cache_key(transcript)
+    cached = cache_get('recipes', cache_key, RECIPE_CACHE_TTL)
+    if cached is not None:
+        logger.info(f"Recipe cache hit (hits: {cache_stats['recipes_hits']}, misses: {cache_stats['recipes_misses']})")
+        return orjson.loads(cached)
+
+    logger.info(f"Recipe cache miss (hits: {cache_stats['recipes_hits']}, misses: {cache_stats['recipes_misses']})")
+
+    # Fall back to a near-duplicate transcript before paying for a new completion
+    embedding = await embed_transcript(transcript)
+    if embedding is not None:
+        similar_key = await asyncio.to_thread(find_similar_recipe, embedding)
+        cached = similar_key and cache_get('recipes', similar_key, RECIPE_CACHE_TTL)
+        if cached:
+            cache_stats['semantic_hits'] += 1
+            logger.info(f"Semantic recipe cache hit (hits: {cache_stats['semantic_hits']})")
+            # Refresh the entry so frequently matched recipes survive eviction
+            cache_touch('recipe_embeddings', similar_key)
+            # Store it under this transcript's exact key so resends skip the embedding lookup
+            cache_set('recipes', cache_key, cached)
+            return orjson.loads(cached)
+
+    transcript = await condense_transcript(transcript)
+    try:
+        started = time.monotonic()
+        stream = await get_openai().chat.completions.create(
+            model=OPENAI_MODEL,
+            stream=True,
+            # JSON mode guarantees the response is a parseable JSON object
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": f"Please create a recipe based on this transcript: {transcript}"}
+            ]
+        )
 
-    except json.JSONDecodeError as e:
+        first_token_at = None
+        last_progress = started
+        parts = []
+        async for chunk in stream:
+            now = time.monotonic()
+            if first_token_at is None:
+                first_token_at = now
+                logger.info(f"Time to first token: {first_token_at - started:.2f}s")
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            if progress_message and now - last_progress >= PROGRESS_EDIT_INTERVAL:
+                last_progress = now
+                await show_progress(progress_message, ''.join(parts))
+
+        recipe_text = ''.join(parts)
+        logger.info(f"Recipe streamed in {time.monotonic() - started:.2f}s")
+        logger.debug("Generated recipe text: %s", recipe_text)
+
+        # Parse once here; callers receive the recipe as a dict
+        recipe = orjson.loads(recipe_text)
+        cache_set('recipes', cache_key, recipe_text)
+        if embedding is not None:
+            cache_set('recipe_embeddings', cache_key, embedding.tobytes())
+            cache_trim('recipe_embeddings', SEMANTIC_CACHE_MAX_ENTRIES)
+        return recipe
+
+    except orjson.JSONDecodeError as e:
         logger.error(f"Error parsing recipe JSON: {e}")
         logger.error(f"Raw recipe text: {recipe_text}")
         return None
@@ -176,79 +635,154 @@ def generate_recipe(transcript):
 
 def split_ingredient(ingredient):
     """Split ingredient string into name and quantity."""
-    # Handle special cases first (optional ingredients, garnishes)
-    if '(optional)' in ingredient:
-        base = ingredient.replace('(optional)', '').strip()
-        is_optional = True
-    else:
-        base = ingredient
-        is_optional = False
-
-    if '(for garnish)' in base:
-        return base.replace('(for garnish)', '').strip(), 'for garnish'
-
-    # Handle "salt to taste" type cases
-    if 'to taste' in base:
-        return base.replace('to taste', '').strip(), 'to taste'
-
-    # Regular ingredient parsing
-    parts = base.split(' ')
-
-    # Find where the ingredient name starts
-    quantity_parts = []
-    name_parts = []
-    measurement_found = False
-
-    for part in parts:
-        # If we haven't found a measurement unit yet, this must be part of the quantity
-        if not measurement_found:
-            if part in ['g', 'ml', 'tbsp', 'tsp', 'cups', 'cup']:
-                quantity_parts.append(part)
-                measurement_found = True
-            else:
-                try:
-                    # Check if it's a number (including decimals)
-                    float(part.replace(',', '.'))
-                    quantity_parts.append(part)
-                except ValueError:
-                    # If it's not a number and not a unit, it's part of the name
-                    measurement_found = True
-                    name_parts.append(part)
-        else:
-            name_parts.append(part)
-
-    quantity = ' '.join(quantity_parts)
-    name = ' '.join(name_parts)
-
-    if is_optional:
+    # Handle special cases first (optional ingredients, garnishes, "salt to taste")
+    suffixes = set(INGREDIENT_SUFFIX_RE.findall(ingredient))
+    base = INGREDIENT_SUFFIX_RE.sub(' ', ingredient).strip()
+
+    if '(for garnish)' in suffixes:
+        return base, 'for garnish'
+    if 'to taste' in suffixes:
+        return base, 'to taste'
+
+    # Regular ingredient parsing: leading amount and unit, the rest is the name
+    match = INGREDIENT_RE.match(base)
+    quantity = ' '.join(part for part in (match['qty'], match['unit']) if part)
+    name = match['name']
+
+    if '(optional)' in suffixes:
         name += ' (optional)'
 
     return name, quantity
 
 
-def get_youtube_thumbnail(video_id):
-    """Get the highest quality thumbnail URL for a YouTube video."""
+async def get_youtube_thumbnail(video_id):
+    """Get the highest quality thumbnail URL that exists for a YouTube video."""
     if not video_id:
         logger.error("Invalid video ID provided for thumbnail.")
         return None
 
-    return f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
+    if video_id in thumbnail_cache:
+        thumbnail_cache.move_to_end(video_id)
+        return thumbnail_cache[video_id]
+
+    # Not every video has a maxres thumbnail, and a broken cover can make Notion reject the page
+    for name in THUMBNAIL_QUALITIES:
+        url = f"https://img.youtube.com/vi/{video_id}/{name}.jpg"
+        try:
+            response = await get_http().head(url, timeout=5.0)
+        except httpx.HTTPError as e:
+            logger.warning(f"Thumbnail probe failed for {url}: {e}")
+            break
+        if response.status_code == 200:
+            thumbnail_cache[video_id] = url
+            if len(thumbnail_cache) > THUMBNAIL_CACHE_SIZE:
+                thumbnail_cache.popitem(last=False)
+            return url
+
+    # hqdefault exists for every public video, so it is the safest fallback
+    return f"https://img.youtube.com/vi/{video_id}/hqdefault.jpg"
+
+
+def _heading(text):
+    """Build a Notion heading block."""
+    return {
+        "object": "block",
+        "type": "heading_2",
+        "heading_2": {
+            "rich_text": [{"type": "text", "text": {"content": text}}]
+        }
+    }
+
+
+def _table_row(*cells):
+    """Build a Notion table row with one text cell per argument."""
+    return {
+        "type": "table_row",
+        "table_row": {
+            "cells": [[{"type": "text", "text": {"content": cell}}] for cell in cells]
+        }
+    }
+
+
+def _numbered_item(text):
+    """Build a Notion numbered list item block."""
+    return {
+        "object": "block",
+        "type": "numbered_list_item",
+        "numbered_list_item": {
+            "rich_text": [{"type": "text", "text": {"content": text}}]
+        }
+    }
+
+
+# Static Notion blocks shared by every recipe page
+HEADING_INGREDIENTS = _heading("Ingredients")
+HEADING_INSTRUCTIONS = _heading("Instructions")
+DIVIDER = {
+    "object": "block",
+    "type": "divider",
+    "divider": {}
+}
+INGREDIENTS_TABLE_HEADER = _table_row("Ingredient", "Quantity")
+
+
+def _ingredients_table(ingredients):
+    """Build the two-column ingredients table block."""
+    return {
+        "object": "block",
+        "type": "table",
+        "table": {
+            "table_width": 2,
+            "has_column_header": True,
+            "has_row_header": False,
+            "children": [
+                INGREDIENTS_TABLE_HEADER,
+                *[_table_row(*split_ingredient(ingredient)) for ingredient in ingredients]
+            ]
+        }
+    }
+
+
+def _is_transient_notion_error(error):
+    """Retry only failures where Notion cannot have applied the write: rate limits and refused connections."""
+    # Page creation and block appends are not idempotent, and a 5xx or timeout may arrive after the write
+    # succeeded, so retrying those could duplicate pages or blocks
+    if isinstance(error, APIResponseError):
+        return error.status == 429
+    return isinstance(error, httpx.ConnectError)
+
+
+notion_retry = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    retry=retry_if_exception(_is_transient_notion_error),
+    reraise=True
+)
+
+
+@notion_retry
+async def create_notion_page(**kwargs):
+    """Create a Notion page, retrying transient failures with exponential backoff."""
+    return await get_notion().pages.create(**kwargs)
 
 
-def save_to_notion(recipe_data, video_url):
-    """Save recipe to Notion database with metadata as properties."""
+@notion_retry
+async def append_notion_blocks(**kwargs):
+    """Append blocks to a Notion page, retrying transient failures with exponential backoff."""
+    return await get_notion().blocks.children.append(**kwargs)
+
+
+async def save_to_notion(recipe, video_url, video_id):
+    """Save a parsed recipe to Notion database with metadata as properties."""
     try:
-        # Parse the recipe_data
-        logger.info(f"Attempting to parse recipe data: {recipe_data}")
-        recipe = json.loads(recipe_data)
+        logger.debug("Saving recipe data: %s", recipe)
 
         if recipe.get('title') == 'NotARecipe':
             logger.info("Recipe marked as NotARecipe")
             return False
 
         # Get video thumbnail
-        video_id = extract_video_id(video_url)
-        thumbnail_url = get_youtube_thumbnail(video_id)
+        thumbnail_url = await get_youtube_thumbnail(video_id)
 
         logger.info(f"Creating Notion page for recipe: {recipe['title']}")
 
@@ -289,80 +823,20 @@ def save_to_notion(recipe_data, video_url):
             }
         }
 
-        # Create ingredients table
-        ingredients_table = {
-            "object": "block",
-            "type": "table",
-            "table": {
-                "table_width": 2,
-                "has_column_header": True,
-                "has_row_header": False,
-                "children": [
-                    {
-                        "type": "table_row",
-                        "table_row": {
-                            "cells": [
-                                [{"type": "text", "text": {"content": "Ingredient"}}],
-                                [{"type": "text", "text": {"content": "Quantity"}}]
-                            ]
-                        }
-                    }
-                ]
-            }
-        }
-
-        # Add ingredients to table
-        for ingredient in recipe['ingredients']:
-            name, quantity = split_ingredient(ingredient)
-            ingredients_table["table"]["children"].append({
-                "type": "table_row",
-                "table_row": {
-                    "cells": [
-                        [{"type": "text", "text": {"content": name}}],
-                        [{"type": "text", "text": {"content": quantity}}]
-                    ]
-                }
-            })
-
         # Combine all blocks with headers and dividers
         all_blocks = [
-            {
-                "object": "block",
-                "type": "heading_2",
-                "heading_2": {
-                    "rich_text": [{"type": "text", "text": {"content": "Ingredients"}}]
-                }
-            },
-            ingredients_table,
-            {
-                "object": "block",
-                "type": "divider",
-                "divider": {}
-            },
-            {
-                "object": "block",
-                "type": "heading_2",
-                "heading_2": {
-                    "rich_text": [{"type": "text", "text": {"content": "Instructions"}}]
-                }
-            }
+            HEADING_INGREDIENTS,
+            _ingredients_table(recipe['ingredients']),
+            DIVIDER,
+            HEADING_INSTRUCTIONS,
+            *[_numbered_item(instruction) for instruction in recipe['instructions']]
         ]
 
-        # Add instructions
-        for instruction in recipe['instructions']:
-            all_blocks.append({
-                "object": "block",
-                "type": "numbered_list_item",
-                "numbered_list_item": {
-                    "rich_text": [{"type": "text", "text": {"content": instruction}}]
-                }
-            })
-
         # Create the page in Notion with properties, blocks, and cover image
-        page = notion.pages.create(
-            parent={"database_id": NOTION_DATABASE_ID},
+        page = await create_notion_page(
+            parent={"database_id": get_config().notion_database_id},
             properties=properties,
-            children=all_blocks,
+            children=all_blocks[:NOTION_MAX_BLOCKS_PER_REQUEST],
             cover={
                 "type": "external",
                 "external": {
@@ -371,63 +845,177 @@ def save_to_notion(recipe_data, video_url):
             }
         )
 
+        # Append any remaining blocks in order, one request per batch
+        for start in range(NOTION_MAX_BLOCKS_PER_REQUEST, len(all_blocks), NOTION_MAX_BLOCKS_PER_REQUEST):
+            await append_notion_blocks(
+                block_id=page['id'],
+                children=all_blocks[start:start + NOTION_MAX_BLOCKS_PER_REQUEST]
+            )
+
         logger.info("Successfully created Notion page")
         return True
 
-    except json.JSONDecodeError as e:
-        logger.error(f"Error parsing recipe JSON in save_to_notion: {e}")
-        logger.error(f"Raw recipe data: {recipe_data}")
-        return False
     except Exception as e:
         logger.error(f"Error saving to Notion: {e}")
+        # Lost access invalidates the cached startup check
+        if isinstance(e, APIResponseError) and e.status in (401, 404):
+            cache_delete('notion_verification', notion_verification_key())
         return False
 
 
+# Jobs are (chat_id, user_id, videos) tuples handed from the update handler to the workers,
+# where videos is a list of (url, video_id, progress_message) for every link in one message
+pipeline_queue = asyncio.Queue()
+pipeline_workers = []
+pending_jobs = Counter()
+# Futures for videos whose pipeline is running, resolving to the reply sent to the user
+inflight = {}
+
+
+async def run_pipeline(url, video_id, transcript, progress_message):
+    """Generate the recipe for one video and save it to Notion, returning the reply for the user."""
+    if not transcript:
+        return f'Could not get video transcript for {url}. Make sure the video has subtitles enabled.'
+
+    recipe = await generate_recipe(transcript, progress_message)
+    if not recipe:
+        return f'Error generating recipe for {url}. Please try again.'
+
+    # Save to Notion with URL
+    if await save_to_notion(recipe, url, video_id):
+        return f"Recipe '{recipe.get('title')}' has been successfully saved to Notion!"
+    return f"There was an error saving {url} to Notion. Please check the logs for details."
+
+
+async def run_batch(bot, chat_id, videos):
+    """Fetch all transcripts of one message concurrently, then run their pipelines side by side."""
+    # Videos already being processed for an earlier message wait for that result instead of starting over
+    loop = asyncio.get_running_loop()
+    owned = [video for video in videos if video[1] not in inflight]
+    for _, video_id, _ in owned:
+        inflight[video_id] = loop.create_future()
+    futures = {video_id: inflight[video_id] for _, video_id, _ in videos}
+
+    async def run_owned(url, video_id, transcript, progress_message):
+        try:
+            reply = await run_pipeline(url, video_id, transcript, progress_message)
+        except Exception as e:
+            logger.error(f"Pipeline failed for {url}: {e}")
+            reply = None
+        inflight.pop(video_id).set_result(reply)
+
+    async def deliver(video_id):
+        if reply := await asyncio.shield(futures[video_id]):
+            await bot.send_message(chat_id, reply)
+
+    try:
+        transcripts = []
+        if owned:
+            # Fetch the transcripts in worker threads while the OpenAI connection warms up
+            transcripts, _ = await asyncio.gather(
+                get_transcripts_batch([video_id for _, video_id, _ in owned]),
+                warm_up_openai()
+            )
+
+        results = await asyncio.gather(
+            *[run_owned(url, video_id, transcript, progress_message)
+              for (url, video_id, progress_message), transcript in zip(owned, transcripts)],
+            *[deliver(video_id) for video_id in futures],
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Failed to deliver a result in chat {chat_id}: {result}")
+    finally:
+        # Release anything left unresolved (e.g. on shutdown) so waiting jobs don't hang
+        for _, video_id, _ in owned:
+            if inflight.get(video_id) is futures[video_id]:
+                inflight.pop(video_id).cancel()
+
+
+async def pipeline_worker(bot):
+    """Run queued pipeline jobs one after another until cancelled."""
+    while True:
+        chat_id, user_id, videos = await pipeline_queue.get()
+        try:
+            await run_batch(bot, chat_id, videos)
+        except Exception as e:
+            logger.error(f"Pipeline failed for chat {chat_id}: {e}")
+        finally:
+            pending_jobs[user_id] -= len(videos)
+            pipeline_queue.task_done()
+
+
 async def process_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    logger.info(f"User_ID: {user_id}")
-    if user_id != AUTHORIZED_USER_ID:
+    logger.debug("User_ID: %s", user_id)
+    if user_id != get_config().authorized_user_id:
         await update.message.reply_text("Sorry, you are not authorized to use this bot.")
         return
 
-    url = update.message.text
+    # A message may contain several links separated by whitespace
+    urls = [word for word in update.message.text.split() if _is_youtube_url(word)]
 
-    if 'youtube.com' in url or 'youtu.be' in url:
-        await update.message.reply_text('Processing video and generating recipe...')
+    # Validate before replying so invalid links never get a "Processing..." message
+    if not urls:
+        await update.message.reply_text('Please send a valid YouTube video URL.')
+        return
 
+    video_urls = {}
+    for url in urls:
         video_id = extract_video_id(url)
-        if not video_id:
-            await update.message.reply_text('Invalid YouTube URL. Please try again.')
-            return
-
-        transcript = get_transcript(video_id)
-        if not transcript:
-            await update.message.reply_text(
-                'Could not get video transcript. Make sure the video has subtitles enabled.')
-            return
-
-        recipe = generate_recipe(transcript)
-        if not recipe:
-            await update.message.reply_text('Error generating recipe. Please try again.')
-            return
-
-        # Save to Notion with URL
-        if save_to_notion(recipe, url):
-            await update.message.reply_text('Recipe has been successfully saved to Notion!')
-        else:
-            error_msg = "There was an error saving to Notion. Please check the logs for details."
-            await update.message.reply_text(error_msg)
-    else:
-        await update.message.reply_text('Please send a valid YouTube video URL.')
+        if video_id:
+            video_urls.setdefault(video_id, url)
+    if not video_urls:
+        await update.message.reply_text('Invalid YouTube URL. Please try again.')
+        return
+
+    if pending_jobs[user_id] + len(video_urls) > MAX_PENDING_PER_USER:
+        await update.message.reply_text(
+            f'You can have at most {MAX_PENDING_PER_USER} videos in progress. Please wait for them to finish.')
+        return
+
+    # Acknowledge right away, then hand the heavy work to the pipeline workers;
+    # each video's message is edited with progress once a worker picks the job up
+    videos = []
+    for video_id, url in video_urls.items():
+        progress_message = await update.message.reply_text(f'Processing {url} and generating recipe...')
+        videos.append((url, video_id, progress_message))
+    pending_jobs[user_id] += len(videos)
+    pipeline_queue.put_nowait((update.message.chat_id, user_id, videos))
 
 
 def main():
     """Start the bot."""
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    config = get_config()
+    application = (
+        Application.builder()
+        .token(config.telegram_token)
+        # Keeps outgoing messages within Telegram's global and per-chat rate limits
+        .rate_limiter(AIORateLimiter())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     application.add_handler(CommandHandler("start", start))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, process_message))
-    logger.info("Starting bot...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if WEBHOOK_URL:
+        # Telegram pushes updates to us; they are acknowledged as soon as they are queued
+        logger.info(f"Starting bot in webhook mode on port {WEBHOOK_PORT}...")
+        application.run_webhook(
+            listen="0.0.0.0",
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_SECRET,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_SECRET}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES
+        )
+    else:
+        logger.info("Starting bot...")
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+    if application.bot_data.get('startup_failed'):
+        sys.exit(1)
 
 
 if __name__ == '__main__':